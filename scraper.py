@@ -14,6 +14,19 @@ import time
 import json
 import random
 import re
+import string
+import hashlib
+import shutil
+import functools
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+from collections import defaultdict
+from itertools import zip_longest
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 print("🚀 Starting DamaDam Scraper (SAFE + OPTIMIZED)...")
@@ -47,17 +60,26 @@ except ImportError:
 
 try:
     import gspread
-    from oauth2client.service_account import ServiceAccountCredentials
+    from google.oauth2.service_account import Credentials
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    from gspread.utils import absolute_range_name
+    from gspread.exceptions import APIError
     print("✅ Google Sheets ready")
 except ImportError:
-    missing_packages.append("gspread oauth2client")
+    missing_packages.append("gspread google-auth")
 
 if missing_packages:
     print(f"❌ Missing packages: {missing_packages}")
     sys.exit(1)
 
 # === CONFIGURATION ===
+BASE_URL = "https://damadam.pk/"
 LOGIN_URL = "https://damadam.pk/login/"
+COOKIE_PATH = os.getenv('DAMADAM_COOKIE_PATH', 'damadam_cookies.json')
+CHECKPOINT_PATH = os.getenv('DAMADAM_CHECKPOINT_PATH', 'scrape_checkpoint.jsonl')
+CHECKPOINT_MAX_AGE = timedelta(hours=6)  # Older checkpointed profiles are scraped again
 
 # Environment variables
 USERNAME = os.getenv('DAMADAM_USERNAME')
@@ -72,10 +94,9 @@ if not all([USERNAME, PASSWORD, SHEET_URL]):
 # SAFE Rate limiting configuration (prevents 429 errors)
 GOOGLE_API_SAFE_LIMITS = {
     'batch_size': 5,                    # Export every 5 profiles
-    'api_call_delay': 1.5,              # 1.5s between each API call
     'batch_delay': 8,                   # 8s pause after each batch
     'max_retries': 3,                   # Retry 3 times on failure
-    'retry_delay': 70                   # 70s wait if rate limited
+    'retry_base_delay': 15              # Backoff base when a 429 has no Retry-After
 }
 
 # Optimized scraping delays (faster but safe)
@@ -83,126 +104,182 @@ MIN_DELAY = 0.7
 MAX_DELAY = 1.2
 LOGIN_DELAY = 3
 PAGE_LOAD_TIMEOUT = 10
+SCRAPE_WORKERS = os.getenv('SCRAPE_WORKERS', '3')  # Parallel browser sessions
+if not SCRAPE_WORKERS.strip().isdigit():
+    print(f"⚠️ SCRAPE_WORKERS={SCRAPE_WORKERS!r} is not a number, using 3")
+    SCRAPE_WORKERS = '3'
+SCRAPE_WORKERS = max(1, int(SCRAPE_WORKERS))
+
+# Resources the scraper never reads; blocked at the network layer via CDP
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.css', '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.webm', '*.m3u8',
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*', '*googlesyndication.com*', '*facebook.net*'
+]
 
 TAGS_CONFIG = {
-    'Following': '🔗 Following',
-    'Followers': '⭐ Followers', 
-    'Bookmark': '📖 Bookmark',
-    'Pending': '⏳ Pending'
+    'Following': sys.intern('🔗 Following'),
+    'Followers': sys.intern('⭐ Followers'),
+    'Bookmark': sys.intern('📖 Bookmark'),
+    'Pending': sys.intern('⏳ Pending')
+}
+
+# Main sheet columns
+HEADERS = ["DATETIME","NICKNAME","TAGS","CITY","GENDER","MARRIED","AGE","JOINED","FOLLOWERS","POSTS","LPOST","LDATE-TIME","PLINK","PIMAGE","INTRO","ROW_HASH"]
+HASH_COL = HEADERS.index("ROW_HASH")  # Hidden column storing row_hash() of each row
+TAGS_COL = HEADERS.index("TAGS")  # Cleared tags count as a change; other cleared cells don't
+
+# Text cleanup and parser patterns (built once at import)
+WHITESPACE_RE = re.compile(r'\s+')  # Unicode \s already covers \xa0 and newlines
+RELATIVE_TIME_RE = re.compile(r'(\d+)\s*(second|minute|hour|day|week|month|year)s?\s*ago', re.IGNORECASE)
+DIGITS_RE = re.compile(r'(\d+)')
+COMMENT_RE = re.compile(r'/comments/(text|image)/(\d+)/')
+
+# Seconds per relative-time unit (month = 30 days, year = 365 days)
+UNIT_SECONDS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+    'week': 604800,
+    'month': 2592000,
+    'year': 31536000
 }
 
 # === PAKISTAN TIMEZONE HELPER ===
+PKT_OFFSET = timedelta(hours=5)
+
 def get_pkt_time():
     """Get current Pakistan time (UTC+5)"""
-    utc_now = datetime.utcnow()
-    pkt_time = utc_now + timedelta(hours=5)
-    return pkt_time
+    return datetime.utcnow() + PKT_OFFSET
 
 # === LOGGING ===
-def log_msg(message, level="INFO"):
-    timestamp = get_pkt_time().strftime("%H:%M:%S")
-    colors = {"INFO": Fore.WHITE, "SUCCESS": Fore.GREEN, "WARNING": Fore.YELLOW, "ERROR": Fore.RED}
-    color = colors.get(level, Fore.WHITE)
-    print(f"{color}[{timestamp}] {level}: {message}{Style.RESET_ALL}")
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
+LOG_LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "SUCCESS": SUCCESS, "WARNING": logging.WARNING, "ERROR": logging.ERROR}
+
+class ColorFormatter(logging.Formatter):
+    """Colored '[HH:MM:SS] LEVEL: message' lines in PKT"""
+    colors = {logging.INFO: Fore.WHITE, SUCCESS: Fore.GREEN, logging.WARNING: Fore.YELLOW, logging.ERROR: Fore.RED}
+    
+    def __init__(self):
+        super().__init__()
+        self.last_second = None  # Only the listener thread runs this formatter, so no lock is needed
+        self.last_timestamp = ""
+    
+    def format(self, record):
+        second = int(record.created)
+        if second != self.last_second:
+            self.last_second = second
+            self.last_timestamp = (datetime.utcfromtimestamp(second) + PKT_OFFSET).strftime("%H:%M:%S")
+        timestamp = self.last_timestamp
+        color = self.colors.get(record.levelno, Fore.WHITE)
+        return f"{color}[{timestamp}] {record.levelname}: {record.getMessage()}{Style.RESET_ALL}"
+
+# QueueHandler merges the message on the caller's thread; the listener thread adds color and writes
+log_queue = queue.SimpleQueue()
+logger = logging.getLogger("scraper")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(ColorFormatter())
+log_listener = logging.handlers.QueueListener(log_queue, stream_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+def log_msg(message, *args, level="INFO"):
+    """Log with %-style args, merged only when the level is enabled"""
+    logger.log(LOG_LEVELS.get(level, logging.INFO), message, *args)
 
 # === STATS ===
 class ScraperStats:
+    __slots__ = ('start_time', 'total', 'current', 'success', 'errors', 'new_profiles', 'updated_profiles',
+                 'tags_processed', 'posts_scraped', 'post_page_loads', 'api_calls', 'lock')
+    
     def __init__(self):
-        self.start_time = get_pkt_time()
+        self.start_time = time.monotonic()
         self.total = self.current = self.success = self.errors = 0
         self.new_profiles = self.updated_profiles = 0
         self.tags_processed = self.posts_scraped = 0
+        self.post_page_loads = 0  # Profiles whose latest post needed a second page load
         self.api_calls = 0
+        self.lock = threading.Lock()  # Workers and the export thread all bump counters
+    
+    def incr(self, name, count=1):
+        """Add to a counter; += on an attribute is not atomic across threads"""
+        with self.lock:
+            setattr(self, name, getattr(self, name) + count)
     
     def show_summary(self):
-        elapsed = str(get_pkt_time() - self.start_time).split('.')[0]
-        print(f"\n{Fore.MAGENTA}📊 FINAL SUMMARY:")
-        print(f"⏱️  Total Time: {elapsed}")
-        print(f"🎯 Target Users: {self.total}")
-        print(f"✅ Successfully Scraped: {self.success}")
-        print(f"❌ Errors: {self.errors}")
-        print(f"🆕 New Profiles: {self.new_profiles}")
-        print(f"🔄 Updated Profiles: {self.updated_profiles}")
-        print(f"🏷️  Tags Processed: {self.tags_processed}")
-        print(f"📝 Posts Scraped: {self.posts_scraped}")
-        print(f"📡 API Calls Made: {self.api_calls}")
+        elapsed_seconds = time.monotonic() - self.start_time
+        lines = [
+            f"\n{Fore.MAGENTA}📊 FINAL SUMMARY:",
+            f"⏱️  Total Time: {timedelta(seconds=int(elapsed_seconds))}",
+            f"🎯 Target Users: {self.total}",
+            f"✅ Successfully Scraped: {self.success}",
+            f"❌ Errors: {self.errors}",
+            f"🆕 New Profiles: {self.new_profiles}",
+            f"🔄 Updated Profiles: {self.updated_profiles}",
+            f"🏷️  Tags Processed: {self.tags_processed}",
+            f"📝 Posts Scraped: {self.posts_scraped}",
+            f"📄 Post Page Fallbacks: {self.post_page_loads}",
+            f"📡 API Calls Made: {self.api_calls}",
+        ]
         if self.total > 0:
-            completion_rate = (self.success / self.total * 100)
-            print(f"📈 Completion Rate: {completion_rate:.1f}%")
-            avg_time = (get_pkt_time() - self.start_time).total_seconds() / max(1, self.success)
-            print(f"⚡ Avg Speed: {avg_time:.1f}s per profile")
-        print(f"{Style.RESET_ALL}")
+            lines.append(f"📈 Completion Rate: {self.success / self.total * 100:.1f}%")
+            lines.append(f"⚡ Avg Speed: {elapsed_seconds / max(1, self.success):.1f}s per profile")
+        lines.append(f"{Style.RESET_ALL}")
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
 
 stats = ScraperStats()
 
 # === DATE CONVERSION ===
-def convert_relative_date_to_absolute(relative_text):
+def parse_relative_time(text, fmt, now=None):
+    """Format 'N units ago' as an absolute PKT time, or None if it doesn't match"""
+    now = now or get_pkt_time()
+    return cached_relative_time(text, fmt, now.replace(second=0, microsecond=0))
+
+@functools.lru_cache(maxsize=4096)
+def cached_relative_time(text, fmt, minute):
+    """parse_relative_time memoized per minute; 'joined' and post texts repeat across profiles"""
+    match = RELATIVE_TIME_RE.search(text)
+    if not match:
+        return None
+    amount = int(match.group(1))
+    target_date = minute - timedelta(seconds=amount * UNIT_SECONDS[match.group(2).lower()])
+    return target_date.strftime(fmt)
+
+def convert_relative_date_to_absolute(relative_text, now=None):
     """Convert '2 months ago' to 'dd-mmm-yy' in PKT"""
     if not relative_text:
         return ""
-    
     relative_text = relative_text.lower().strip()
-    now = get_pkt_time()
-    
-    try:
-        match = re.search(r'(\d+)\s*(second|minute|hour|day|week|month|year)s?\s*ago', relative_text)
-        if match:
-            amount = int(match.group(1))
-            unit = match.group(2)
-            
-            delta_map = {
-                'second': timedelta(seconds=amount),
-                'minute': timedelta(minutes=amount),
-                'hour': timedelta(hours=amount),
-                'day': timedelta(days=amount),
-                'week': timedelta(weeks=amount),
-                'month': timedelta(days=amount * 30),
-                'year': timedelta(days=amount * 365)
-            }
-            
-            if unit in delta_map:
-                target_date = now - delta_map[unit]
-                return target_date.strftime("%d-%b-%y")
-        return relative_text
-    except:
-        return relative_text
-
-def parse_post_timestamp(timestamp_text):
+    return parse_relative_time(relative_text, "%d-%b-%y", now) or relative_text
+
+def parse_post_timestamp(timestamp_text, now=None):
     """Parse post timestamp to 'dd-mmm-yy hh:mm A/P' in PKT"""
     if not timestamp_text:
         return "N/A"
-    
     timestamp_text = timestamp_text.strip()
-    now = get_pkt_time()
-    
-    try:
-        match = re.search(r'(\d+)\s*(second|minute|hour|day|week|month|year)s?\s*ago', timestamp_text.lower())
-        if match:
-            amount = int(match.group(1))
-            unit = match.group(2)
-            
-            delta_map = {
-                'second': timedelta(seconds=amount),
-                'minute': timedelta(minutes=amount),
-                'hour': timedelta(hours=amount),
-                'day': timedelta(days=amount),
-                'week': timedelta(weeks=amount),
-                'month': timedelta(days=amount * 30),
-                'year': timedelta(days=amount * 365)
-            }
-            
-            if unit in delta_map:
-                target_date = now - delta_map[unit]
-                return target_date.strftime("%d-%b-%y %I:%M %p")
-        return timestamp_text
-    except:
-        return timestamp_text
+    return parse_relative_time(timestamp_text, "%d-%b-%y %I:%M %p", now) or timestamp_text
 
 # === BROWSER SETUP ===
+@functools.lru_cache(maxsize=None)
+def get_chromedriver_path():
+    """Resolve chromedriver once per run: PATH first, download only if missing"""
+    path = shutil.which('chromedriver')
+    if path:
+        return path
+    log_msg("chromedriver not on PATH, downloading...", level="WARNING")
+    return ChromeDriverManager().install()
+
 def setup_github_browser():
     """Setup optimized browser"""
     try:
-        log_msg("Setting up browser...", "INFO")
+        log_msg("Setting up browser...", level="INFO")
         options = webdriver.ChromeOptions()
         options.add_argument("--headless=new")
         options.add_argument("--no-sandbox")
@@ -211,78 +288,155 @@ def setup_github_browser():
         options.add_argument("--window-size=1920,1080")
         options.add_argument("--disable-extensions")
         options.add_argument("--blink-settings=imagesEnabled=false")  # Faster: no images
+        # Trim background browser work that a scrape never needs
+        options.add_argument("--no-first-run")
+        options.add_argument("--mute-audio")
+        options.add_argument("--disable-sync")
+        options.add_argument("--disable-default-apps")
+        options.add_argument("--disable-background-networking")
+        options.add_argument("--disable-component-update")
+        options.add_argument("--disable-features=Translate,OptimizationHints,MediaRouter")
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_argument("--log-level=3")
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
         options.page_load_strategy = 'eager'  # Don't wait for all resources
         
-        try:
-            service = Service()
-            driver = webdriver.Chrome(service=service, options=options)
-        except:
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
+        driver = webdriver.Chrome(service=Service(get_chromedriver_path()), options=options)
         
         driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        driver.set_script_timeout(PAGE_LOAD_TIMEOUT)  # Covers PROFILE_WAIT_MS in the async extractor
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            log_msg(f"Resource blocking unavailable: {e}", level="WARNING")
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        log_msg("Browser ready", "SUCCESS")
+        log_msg("Browser ready", level="SUCCESS")
         return driver
     except Exception as e:
-        log_msg(f"Browser setup failed: {e}", "ERROR")
+        log_msg(f"Browser setup failed: {e}", level="ERROR")
         return None
 
 # === AUTHENTICATION ===
+def is_logged_in(driver):
+    """Logged in only once the URL has left the login page and no login form is shown"""
+    if "login" in driver.current_url.lower():
+        return False
+    return not driver.find_elements(By.CSS_SELECTOR, "#nick, input[name='nick'], .login-form")
+
+def save_session_cookies(driver):
+    """Persist session cookies so the next run can skip the login form"""
+    try:
+        with open(COOKIE_PATH, 'w') as f:
+            json.dump(driver.get_cookies(), f)
+    except Exception as e:
+        log_msg(f"Could not save session cookies: {e}", level="WARNING")
+
+def inject_cookies(driver, cookies):
+    """Load the site origin once and add session cookies to it"""
+    driver.get(BASE_URL)
+    for cookie in cookies:
+        driver.add_cookie({k: cookie[k] for k in ("name", "value", "domain", "path") if k in cookie})
+
+def restore_session(driver):
+    """Reuse saved cookies; returns True if the session is still valid"""
+    if not os.path.exists(COOKIE_PATH):
+        return False
+    
+    try:
+        log_msg("Restoring saved session...", level="INFO")
+        with open(COOKIE_PATH) as f:
+            cookies = json.load(f)
+        
+        inject_cookies(driver, cookies)
+        
+        # A valid session is redirected away from the login page
+        driver.get(LOGIN_URL)
+        if is_logged_in(driver):
+            log_msg("Session restored, login skipped", level="SUCCESS")
+            return True
+        
+        driver.delete_all_cookies()
+        log_msg("Saved session expired", level="WARNING")
+    except Exception as e:
+        log_msg(f"Session restore failed: {e}", level="WARNING")
+    return False
+
 def login_to_damadam(driver):
     """Login to DamaDam"""
     try:
-        log_msg("Logging in...", "INFO")
+        log_msg("Logging in...", level="INFO")
         driver.get(LOGIN_URL)
-        time.sleep(2)
         
-        try:
-            nick_field = WebDriverWait(driver, 8).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "#nick"))
-            )
-            pass_field = driver.find_element(By.CSS_SELECTOR, "#pass")
-            submit_btn = driver.find_element(By.CSS_SELECTOR, "form button")
-            
-            nick_field.clear()
-            nick_field.send_keys(USERNAME)
-            pass_field.clear()
-            pass_field.send_keys(PASSWORD)
-            submit_btn.click()
-        except:
-            nick_field = driver.find_element(By.CSS_SELECTOR, "input[name='nick']")
-            pass_field = driver.find_element(By.CSS_SELECTOR, "input[name='pass']")
-            submit_btn = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
-            
-            nick_field.send_keys(USERNAME)
-            pass_field.send_keys(PASSWORD)
-            submit_btn.click()
+        # Probe both known form layouts in one wait instead of timing out on the first
+        nick_field = WebDriverWait(driver, 8).until(
+            lambda d: d.execute_script("return document.querySelector('#nick, input[name=\"nick\"]')")
+        )
+        pass_field = driver.find_element(By.CSS_SELECTOR, "#pass, input[name='pass']")
+        submit_btn = driver.find_element(By.CSS_SELECTOR, "form button, button[type='submit']")
+        
+        nick_field.clear()
+        nick_field.send_keys(USERNAME)
+        pass_field.clear()
+        pass_field.send_keys(PASSWORD)
+        submit_btn.click()
         
         time.sleep(LOGIN_DELAY)
         
-        if "login" not in driver.current_url.lower():
-            log_msg("Login successful!", "SUCCESS")
+        if is_logged_in(driver):
+            log_msg("Login successful!", level="SUCCESS")
+            save_session_cookies(driver)
             return True
         else:
-            log_msg("Login failed", "ERROR")
+            log_msg("Login failed", level="ERROR")
             return False
     except Exception as e:
-        log_msg(f"Login error: {e}", "ERROR")
+        log_msg(f"Login error: {e}", level="ERROR")
         return False
 
+# === SHEET DATA ===
+def load_sheet_data(workbook, worksheet):
+    """Fetch Target, Tags and the main sheet in a single batchGet"""
+    log_msg("Loading targets, tags and existing profiles...", level="INFO")
+    main_range = absolute_range_name(worksheet.title)
+    try:
+        response = safe_api_call(workbook.values_batch_get, ["Target", "Tags", main_range])
+        target_range, tags_range, profiles_range = response['valueRanges']
+        return target_range.get('values', []), tags_range.get('values', []), profiles_range.get('values', [])
+    except APIError as e:
+        # Only a missing sheet may fall through; any other failure would wipe every row's TAGS
+        if e.response.status_code != 400 or "Unable to parse range" not in e.response.text:
+            log_msg(f"Failed to load sheet data: {e}", level="ERROR")
+            return [], None, []
+        log_msg("Batch read hit a missing sheet, retrying without Tags", level="WARNING")
+    except Exception as e:
+        log_msg(f"Failed to load sheet data: {e}", level="ERROR")
+        return [], None, []
+    
+    # Tags is optional, so a missing Tags sheet must not block the other reads
+    try:
+        response = safe_api_call(workbook.values_batch_get, ["Target", main_range])
+        target_range, profiles_range = response['valueRanges']
+        return target_range.get('values', []), None, profiles_range.get('values', [])
+    except Exception as e:
+        log_msg(f"Failed to load targets: {e}", level="ERROR")
+        return [], None, []
+
+def build_row_index(profile_rows):
+    """Map NICKNAME -> {'row_index', 'hash', 'data'} for the main sheet, hashed once"""
+    # Rows are padded to the full width so the diff can index cells without len() checks
+    return {
+        row[1].strip(): {'row_index': i, 'hash': stored_row_hash(row), 'data': row + [""] * (len(HEADERS) - len(row))}
+        for i, row in enumerate(profile_rows[1:], 2)
+        if len(row) > 1 and row[1].strip()
+    }
+
 # === TARGET USERS ===
-def get_target_users(client, sheet_url):
-    """Get target users from Target sheet"""
+def get_target_users(target_data):
+    """Get target users from prefetched Target sheet rows"""
     try:
-        log_msg("Loading target users...", "INFO")
-        workbook = client.open_by_url(sheet_url)
-        target_sheet = workbook.worksheet("Target")
-        target_data = target_sheet.get_all_values()
-        stats.api_calls += 1
-        
         if not target_data or len(target_data) < 2:
-            log_msg("Target sheet empty", "WARNING")
+            log_msg("Target sheet empty", level="WARNING")
             return []
         
         pending_users = []
@@ -293,68 +447,126 @@ def get_target_users(client, sheet_url):
                 if username and status == 'PENDING':
                     pending_users.append({'username': username, 'row_index': i})
         
-        log_msg(f"Found {len(pending_users)} pending users", "SUCCESS")
+        log_msg(f"Found {len(pending_users)} pending users", level="SUCCESS")
         return pending_users
     except Exception as e:
-        log_msg(f"Failed to load targets: {e}", "ERROR")
+        log_msg(f"Failed to load targets: {e}", level="ERROR")
         return []
 
 # === POST SCRAPING (OPTIMIZED) ===
-def scrape_recent_post(driver, nickname):
+COMMENT_URL_FORMATS = {
+    'text': "https://damadam.pk/comments/text/{}/",
+    'image': "https://damadam.pk/content/{}/g/"
+}
+
+def format_comment_url(href):
+    match = COMMENT_RE.search(href)
+    return COMMENT_URL_FORMATS[match.group(1)].format(match.group(2)) if match else ""
+
+POST_URL_PATTERNS = [
+    ("/content/", lambda h: h if h.startswith('http') else f"https://damadam.pk{h}"),
+    ("/comments/text/", format_comment_url),
+    ("/comments/image/", format_comment_url)
+]
+
+# In-page extraction: one WebDriver round-trip per page instead of one per field
+POST_CARD_JS = """
+function extractPost(card) {
+    if (!card) return null;
+    const time = card.querySelector('time');
+    return {
+        hrefs: Array.from(card.querySelectorAll("a[href*='/content/'], a[href*='/comments/text/'], a[href*='/comments/image/']"), a => a.href).filter(Boolean),
+        time: time ? time.innerText.trim() : null
+    };
+}
+"""
+
+POST_EXTRACT_JS = POST_CARD_JS + "return extractPost(arguments[0]);"
+
+# Async script: waits for the profile header with a MutationObserver, then extracts in the same call
+PROFILE_EXTRACT_JS = POST_CARD_JS + """
+function extractProfile(labels) {
+    const text = sel => { const el = document.querySelector(sel); return el ? el.innerText : ''; };
+    // One pass over <b> labels; the first match with a following <span> wins per label
+    const fields = Object.fromEntries(labels.map(label => [label, '']));
+    let pending = labels.slice();
+    for (const b of document.querySelectorAll('b')) {
+        if (!pending.length) break;
+        const label = pending.find(l => b.textContent.includes(l));
+        if (!label) continue;
+        let sib = b.nextElementSibling;
+        while (sib && sib.tagName !== 'SPAN') sib = sib.nextElementSibling;
+        if (!sib) continue;
+        fields[label] = sib.innerText.trim();
+        pending = pending.filter(l => l !== label);
+    }
+    const img = document.querySelector("img[src*='avatar']");
+    return {
+        intro: text('.ow span.nos'),
+        fields: fields,
+        followers: text('span.cl.sp.clb'),
+        posts: text("a[href*='/profile/public/'] button div:first-child"),
+        pimage: img ? img.src : '',
+        post: extractPost(document.querySelector('article.mbl.bas-sh'))
+    };
+}
+const [labels, timeoutMs, done] = arguments;
+const ready = () => document.querySelector('h1.cxl.clb.lsp');
+if (ready()) {
+    done(extractProfile(labels));
+} else {
+    const observer = new MutationObserver(() => {
+        if (!ready()) return;
+        observer.disconnect();
+        clearTimeout(timer);
+        done(extractProfile(labels));
+    });
+    const timer = setTimeout(() => { observer.disconnect(); done(null); }, timeoutMs);
+    observer.observe(document.documentElement, {childList: true, subtree: true});
+}
+"""
+PROFILE_WAIT_MS = 8000
+
+PROFILE_FIELDS = {'City:': 'CITY', 'Gender:': 'GENDER', 'Married:': 'MARRIED', 'Age:': 'AGE', 'Joined:': 'JOINED'}
+
+def parse_recent_post(post_info, now=None):
+    """Build LPOST and LDATE-TIME from extracted post card data"""
+    post_data = {'LPOST': '', 'LDATE-TIME': ''}
+    hrefs = post_info.get('hrefs') or []
+    
+    for marker, formatter in POST_URL_PATTERNS:
+        href = next((h for h in hrefs if marker in h), None)
+        if href:
+            formatted = formatter(href)
+            if formatted:
+                post_data['LPOST'] = formatted
+                break
+    
+    if not post_data['LPOST']:
+        post_data['LPOST'] = "[No Post URL]"
+    
+    post_time = post_info.get('time')
+    post_data['LDATE-TIME'] = parse_post_timestamp(post_time, now) if post_time is not None else "N/A"
+    
+    stats.incr('posts_scraped')
+    return post_data
+
+def scrape_recent_post(driver, nickname, now=None):
     """Scrape recent post URL - OPTIMIZED"""
     post_url = f"https://damadam.pk/profile/public/{nickname}"
     try:
         driver.get(post_url)
         
         try:
-            WebDriverWait(driver, 5).until(
+            recent_post = WebDriverWait(driver, 5).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "article.mbl.bas-sh"))
             )
         except TimeoutException:
             return {'LPOST': '[No Posts]', 'LDATE-TIME': 'N/A'}
         
-        recent_post = driver.find_element(By.CSS_SELECTOR, "article.mbl.bas-sh")
-        post_data = {'LPOST': '', 'LDATE-TIME': ''}
-        
-        # URL extraction (fixed f-string backslash issue)
-        def format_text_url(href):
-            match = re.search(r'/comments/text/(\d+)/', href)
-            return f"https://damadam.pk/comments/text/{match.group(1)}/" if match else ""
-        
-        def format_image_url(href):
-            match = re.search(r'/comments/image/(\d+)/', href)
-            return f"https://damadam.pk/content/{match.group(1)}/g/" if match else ""
-        
-        url_patterns = [
-            ("a[href*='/content/']", lambda h: h if h.startswith('http') else f"https://damadam.pk{h}"),
-            ("a[href*='/comments/text/']", format_text_url),
-            ("a[href*='/comments/image/']", format_image_url)
-        ]
-        
-        for selector, formatter in url_patterns:
-            try:
-                link = recent_post.find_element(By.CSS_SELECTOR, selector)
-                href = link.get_attribute('href')
-                if href:
-                    formatted = formatter(href)
-                    if formatted:
-                        post_data['LPOST'] = formatted
-                        break
-            except:
-                continue
-        
-        if not post_data['LPOST']:
-            post_data['LPOST'] = "[No Post URL]"
-        
-        try:
-            time_elem = recent_post.find_element(By.CSS_SELECTOR, "time")
-            post_data['LDATE-TIME'] = parse_post_timestamp(time_elem.text.strip())
-        except:
-            post_data['LDATE-TIME'] = "N/A"
-        
-        stats.posts_scraped += 1
-        return post_data
+        return parse_recent_post(driver.execute_script(POST_EXTRACT_JS, recent_post), now)
     except Exception as e:
+        log_msg("Recent post scrape failed for %s: %s", nickname, e, level="WARNING")
         return {'LPOST': '[Error]', 'LDATE-TIME': 'N/A'}
 
 # === PROFILE SCRAPING (OPTIMIZED) ===
@@ -363,12 +575,13 @@ def scrape_profile(driver, nickname):
     url = f"https://damadam.pk/users/{nickname}/"
     try:
         driver.get(url)
-        WebDriverWait(driver, 8).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "h1.cxl.clb.lsp"))
-        )
+        page = driver.execute_async_script(PROFILE_EXTRACT_JS, list(PROFILE_FIELDS), PROFILE_WAIT_MS)
+        if page is None:
+            raise TimeoutException("profile header never appeared")
         
         now = get_pkt_time()
         data = {
+            'SCRAPED_AT': now,  # Raw DATETIME, used to order new rows without re-parsing
             'DATETIME': now.strftime("%d-%b-%y %I:%M %p"),
             'NICKNAME': nickname,
             'TAGS': '',
@@ -386,46 +599,31 @@ def scrape_profile(driver, nickname):
             'INTRO': ''
         }
         
-        try:
-            intro = driver.find_element(By.CSS_SELECTOR, ".ow span.nos")
-            data['INTRO'] = clean_text(intro.text)
-        except:
-            pass
+        if page['intro']:
+            data['INTRO'] = clean_text(page['intro'])
         
-        fields = {'City:': 'CITY', 'Gender:': 'GENDER', 'Married:': 'MARRIED', 'Age:': 'AGE', 'Joined:': 'JOINED'}
-        for field_text, key in fields.items():
-            try:
-                elem = driver.find_element(By.XPATH, f"//b[contains(text(), '{field_text}')]/following-sibling::span[1]")
-                value = elem.text.strip()
-                if value:
-                    data[key] = convert_relative_date_to_absolute(value) if key == "JOINED" else clean_text(value)
-            except:
-                pass
+        for field_text, key in PROFILE_FIELDS.items():
+            value = page['fields'].get(field_text, "")
+            if value:
+                data[key] = convert_relative_date_to_absolute(value, now) if key == "JOINED" else clean_text(value)
         
-        try:
-            followers = driver.find_element(By.CSS_SELECTOR, "span.cl.sp.clb")
-            match = re.search(r'(\d+)', followers.text)
-            if match:
-                data['FOLLOWERS'] = match.group(1)
-        except:
-            pass
+        match = DIGITS_RE.search(page['followers'])
+        if match:
+            data['FOLLOWERS'] = match.group(1)
         
-        try:
-            posts = driver.find_element(By.CSS_SELECTOR, "a[href*='/profile/public/'] button div:first-child")
-            match = re.search(r'(\d+)', posts.text)
-            if match:
-                data['POSTS'] = match.group(1)
-        except:
-            pass
+        match = DIGITS_RE.search(page['posts'])
+        if match:
+            data['POSTS'] = match.group(1)
         
-        try:
-            img = driver.find_element(By.CSS_SELECTOR, "img[src*='avatar']")
-            data['PIMAGE'] = img.get_attribute('src')
-        except:
-            pass
+        data['PIMAGE'] = page['pimage'] or ''
         
         if data['POSTS'] and data['POSTS'] != '0':
-            post_data = scrape_recent_post(driver, nickname)
+            # Reuse a post card already on this page before loading the posts page
+            if page['post']:
+                post_data = parse_recent_post(page['post'], now)
+            else:
+                stats.incr('post_page_loads')
+                post_data = scrape_recent_post(driver, nickname, now)
             data['LPOST'] = post_data['LPOST']
             data['LDATE-TIME'] = post_data['LDATE-TIME']
         else:
@@ -434,7 +632,7 @@ def scrape_profile(driver, nickname):
         
         return data
     except Exception as e:
-        log_msg(f"Failed to scrape {nickname}: {e}", "ERROR")
+        log_msg("Failed to scrape %s: %s", nickname, e, level="ERROR")
         return None
 
 # === UTILITIES ===
@@ -442,139 +640,180 @@ def clean_text(text):
     """Clean text"""
     if not text:
         return ""
-    text = str(text).strip().replace('\xa0', ' ').replace('\n', ' ')
-    return re.sub(r'\s+', ' ', text).strip()
+    return WHITESPACE_RE.sub(' ', str(text)).strip()
+
+# Columns compared when deciding whether an existing row needs an update
+DIFF_COLUMNS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 14)
+
+def row_hash(row):
+    """8-byte hex digest of a row's DIFF_COLUMNS cells"""
+    cells = (row[idx] if idx < len(row) else "" for idx in DIFF_COLUMNS)
+    return hashlib.blake2b('\x1f'.join(cells).encode(), digest_size=8).hexdigest()
+
+def stored_row_hash(row):
+    """ROW_HASH cell of a sheet row, computed for rows written before the column existed"""
+    return row[HASH_COL] if len(row) > HASH_COL and row[HASH_COL] else row_hash(row)
 
 def column_letter(col_idx):
-    """Convert column index to letter (0=A, 25=Z, 26=AA, etc.)"""
-    result = ""
-    while col_idx >= 0:
-        result = chr(65 + (col_idx % 26)) + result
-        col_idx = col_idx // 26 - 1
-    return result
+    """Convert column index to letter (0=A, 25=Z, 26=AA, ... 701=ZZ)"""
+    if col_idx < 26:
+        return string.ascii_uppercase[col_idx]
+    high, low = divmod(col_idx, 26)
+    return string.ascii_uppercase[high - 1] + string.ascii_uppercase[low]
+
+LAST_COLUMN = column_letter(len(HEADERS) - 1)
 
 # === GOOGLE SHEETS ===
 def get_google_sheets_client():
     """Setup Google Sheets"""
     try:
         creds_dict = json.loads(os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON'))
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        return gspread.authorize(creds)
+        scope = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+        creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
+        
+        # One keep-alive session for every Sheets call. The transport only retries what cannot
+        # double-apply: failed connects, and 5xx on idempotent GET/PUT. A batchUpdate POST is never
+        # resent here, and 429s are left to safe_api_call.
+        session = AuthorizedSession(creds)
+        retry = Retry(total=3, connect=3, read=0, other=0, backoff_factor=1.0,
+                      status_forcelist=[500, 502, 503, 504], allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                      raise_on_status=False)
+        session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry))
+        return gspread.Client(auth=creds, session=session)
     except Exception as e:
-        log_msg(f"Sheets client failed: {e}", "ERROR")
+        log_msg(f"Sheets client failed: {e}", level="ERROR")
         return None
 
-def get_tags_mapping(client, sheet_url):
-    """Get tags from Tags sheet"""
+def get_tags_mapping(tags_data):
+    """Map nickname -> joined tag string from prefetched Tags sheet rows"""
+    if tags_data is None:
+        log_msg("Tags sheet not found", level="WARNING")
+        return {}
+    
     try:
-        log_msg("Loading tags...", "INFO")
-        workbook = client.open_by_url(sheet_url)
-        tags_sheet = workbook.worksheet("Tags")
-        tags_data = tags_sheet.get_all_values()
-        stats.api_calls += 1
-        
         if not tags_data:
             return {}
         
-        tags_mapping = {}
-        headers = tags_data[0]
-        for col_idx, header in enumerate(headers):
-            if header.strip():
-                tag_icon = TAGS_CONFIG.get(header.strip(), f"🔌 {header.strip()}")
-                for row in tags_data[1:]:
-                    if col_idx < len(row) and row[col_idx].strip():
-                        nick = row[col_idx].strip()
-                        if nick not in tags_mapping:
-                            tags_mapping[nick] = []
-                        tags_mapping[nick].append(tag_icon)
+        tags_mapping = defaultdict(list)
+        icons = [TAGS_CONFIG.get(h.strip(), sys.intern(f"🔌 {h.strip()}")) if h.strip() else None for h in tags_data[0]]
+        # Walk column by column so each nick keeps its tags in header order
+        columns = zip_longest(*tags_data[1:], fillvalue="")
+        for tag_icon, column in zip(icons, columns):
+            if not tag_icon:
+                continue
+            for cell in column:
+                nick = cell.strip()
+                if nick:
+                    tags_mapping[nick].append(tag_icon)
         
         stats.tags_processed = len(tags_mapping)
-        log_msg(f"Loaded {len(tags_mapping)} tags", "SUCCESS")
-        return tags_mapping
-    except:
-        log_msg("Tags sheet not found", "WARNING")
+        log_msg(f"Loaded {len(tags_mapping)} tags", level="SUCCESS")
+        return {nick: ", ".join(nick_icons) for nick, nick_icons in tags_mapping.items()}
+    except Exception as e:
+        log_msg(f"Failed to parse tags: {e}", level="WARNING")
         return {}
 
-def get_tags_for_nickname(nickname, tags_mapping):
-    """Get tags string"""
-    if not tags_mapping or nickname not in tags_mapping:
-        return ""
-    return ", ".join(tags_mapping[nickname])
-
 def safe_api_call(func, *args, **kwargs):
-    """Wrapper for API calls with retry logic"""
-    for attempt in range(GOOGLE_API_SAFE_LIMITS['max_retries']):
+    """Call a Sheets API function, backing off on 429 for as long as Google asks"""
+    max_retries = GOOGLE_API_SAFE_LIMITS['max_retries']
+    for attempt in range(max_retries):
         try:
             result = func(*args, **kwargs)
-            stats.api_calls += 1
-            time.sleep(GOOGLE_API_SAFE_LIMITS['api_call_delay'])
+            stats.incr('api_calls')
             return result
-        except Exception as e:
-            if "429" in str(e) or "quota" in str(e).lower():
-                if attempt < GOOGLE_API_SAFE_LIMITS['max_retries'] - 1:
-                    log_msg(f"Rate limited, waiting {GOOGLE_API_SAFE_LIMITS['retry_delay']}s...", "WARNING")
-                    time.sleep(GOOGLE_API_SAFE_LIMITS['retry_delay'])
-                else:
-                    raise
-            else:
+        except APIError as e:
+            if e.response.status_code != 429 or attempt == max_retries - 1:
                 raise
-    return None
+            retry_after = e.response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                wait = int(retry_after)
+            else:
+                wait = GOOGLE_API_SAFE_LIMITS['retry_base_delay'] * 2 ** attempt + random.uniform(0, 1)
+            log_msg("Rate limited, waiting %.0fs...", wait, level="WARNING")
+            time.sleep(wait)
 
-# === SAFE BATCH EXPORT ===
-def export_batch_safe(profiles_batch, tags_mapping, target_updates, client):
-    """Safe batch export with rate limiting"""
-    if not profiles_batch and not target_updates:
+def ensure_headers(worksheet, profile_rows):
+    """Write missing headers and hide ROW_HASH; returns False if its column is already in use"""
+    header_row = profile_rows[0] if profile_rows else None
+    if header_row and len(header_row) > HASH_COL and header_row[HASH_COL] == "ROW_HASH":
+        return True
+    
+    # Never write hashes over a column the sheet already uses for something else
+    if any(len(row) > HASH_COL and row[HASH_COL].strip() for row in profile_rows):
+        log_msg(f"Column {column_letter(HASH_COL)} is already in use, cannot store ROW_HASH there", level="ERROR")
         return False
     
     try:
-        workbook = client.open_by_url(SHEET_URL)
-        
-        # Update target sheet
-        if target_updates:
-            try:
-                target_sheet = workbook.worksheet("Target")
-                for update in target_updates:
-                    row_idx = update['row_index']
-                    status = update['status']
-                    notes = update.get('notes', '')
-                    timestamp = get_pkt_time().strftime("%Y-%m-%d %H:%M") if status.upper() == 'COMPLETED' else ''
-                    
-                    update_range = f'B{row_idx}:D{row_idx}'
-                    safe_api_call(target_sheet.update, update_range, [[status, timestamp, notes]])
-                
-                log_msg(f"Updated {len(target_updates)} target statuses", "SUCCESS")
-            except Exception as e:
-                log_msg(f"Target update failed: {e}", "WARNING")
-        
-        if not profiles_batch:
-            return True
-        
-        # Main worksheet
-        worksheet = workbook.sheet1
-        headers = ["DATETIME","NICKNAME","TAGS","CITY","GENDER","MARRIED","AGE","JOINED","FOLLOWERS","POSTS","LPOST","LDATE-TIME","PLINK","PIMAGE","INTRO"]
-        
-        existing_data = safe_api_call(worksheet.get_all_values)
-        
-        if not existing_data or not existing_data[0]:
-            safe_api_call(worksheet.append_row, headers)
-            log_msg("Headers added", "SUCCESS")
-            existing_rows = {}
+        if header_row is None:
+            safe_api_call(worksheet.append_row, HEADERS)
         else:
-            existing_rows = {}
-            for i, row in enumerate(existing_data[1:], 2):
-                if len(row) > 1 and row[1].strip():
-                    existing_rows[row[1].strip()] = {'row_index': i, 'data': row}
+            safe_api_call(worksheet.update, f'A1:{LAST_COLUMN}1', [HEADERS])
         
+        safe_api_call(worksheet.spreadsheet.batch_update, {"requests": [{
+            "updateDimensionProperties": {
+                "range": {"sheetId": worksheet.id, "dimension": "COLUMNS", "startIndex": HASH_COL, "endIndex": HASH_COL + 1},
+                "properties": {"hiddenByUser": True},
+                "fields": "hiddenByUser"
+            }
+        }]})
+        log_msg("Headers added", level="SUCCESS")
+        return True
+    except Exception as e:
+        log_msg(f"Header setup failed: {e}", level="ERROR")
+        return False
+
+# === SAFE BATCH EXPORT ===
+HIGHLIGHT_FORMAT = {"backgroundColor": {"red": 1.0, "green": 1.0, "blue": 0.0}, "textFormat": {"bold": True}}
+
+def highlight_requests(sheet_id, rows_by_col):
+    """One repeatCell per run of consecutive highlighted rows in each column"""
+    requests = []
+    for col_idx, rows in rows_by_col.items():
+        rows = sorted(set(rows))
+        start = prev = rows[0]
+        for row_idx in rows[1:] + [None]:
+            if row_idx == prev + 1:
+                prev = row_idx
+                continue
+            requests.append({"repeatCell": {
+                "range": {"sheetId": sheet_id, "startRowIndex": start - 1, "endRowIndex": prev,
+                          "startColumnIndex": col_idx, "endColumnIndex": col_idx + 1},
+                "cell": {"userEnteredFormat": HIGHLIGHT_FORMAT},
+                "fields": "userEnteredFormat(backgroundColor,textFormat.bold)"
+            }})
+            start = prev = row_idx
+    return requests
+
+def row_data(values):
+    """RowData with every cell written as a plain string, like RAW input"""
+    return {"values": [{"userEnteredValue": {"stringValue": str(v)}} for v in values]}
+
+def update_cells_request(sheet_id, row_idx, start_col, rows):
+    """updateCells writing rows starting at 1-based row_idx, column start_col"""
+    return {"updateCells": {
+        "range": {"sheetId": sheet_id, "startRowIndex": row_idx - 1, "endRowIndex": row_idx - 1 + len(rows),
+                  "startColumnIndex": start_col, "endColumnIndex": start_col + max(len(r) for r in rows)},
+        "rows": [row_data(r) for r in rows],
+        "fields": "userEnteredValue"
+    }}
+
+def export_batch_safe(profiles_batch, tags_str_mapping, target_updates, worksheet, target_sheet_id, existing_rows):
+    """Write profiles (new rows, updates, highlights) in one batchUpdate, then Target statuses"""
+    if not profiles_batch and not target_updates:
+        return False
+    
+    try:
+        sheet_requests = []
         new_profiles = []
         updates_to_apply = []
+        batch_rows = []
         
         for profile in profiles_batch:
             nickname = profile.get("NICKNAME", "").strip()
             if not nickname:
                 continue
             
-            profile['TAGS'] = get_tags_for_nickname(nickname, tags_mapping)
+            profile['TAGS'] = tags_str_mapping.get(nickname, "")
             
             row = [
                 profile.get("DATETIME", ""),
@@ -591,129 +830,331 @@ def export_batch_safe(profiles_batch, tags_mapping, target_updates, client):
                 profile.get("LDATE-TIME", ""),
                 profile.get("PLINK", ""),
                 profile.get("PIMAGE", ""),
-                clean_text(profile.get("INTRO", ""))
+                profile.get("INTRO", "")  # Already cleaned by scrape_profile
             ]
-            
+            row.append(row_hash(row))
+            batch_rows.append((nickname, row, profile.get('SCRAPED_AT', datetime.min)))
+        
+        for nickname, row, scraped_at in batch_rows:
             if nickname in existing_rows:
                 info = existing_rows[nickname]
-                row_index = info['row_index']
-                old_row = info['data']
-                
-                needs_update = False
-                updated_cells = []
                 
-                for idx in [3,4,5,6,7,8,9,10,11,14]:
-                    old_val = old_row[idx] if idx < len(old_row) else ""
-                    new_val = row[idx] if idx < len(row) else ""
-                    if old_val != new_val and new_val:
-                        needs_update = True
-                        updated_cells.append(idx)
+                # Unchanged rows (the common case) skip the per-cell diff
+                if info['hash'] == row[HASH_COL]:
+                    continue
+                old_row = info['data']
                 
-                old_tags = old_row[2] if len(old_row) > 2 else ""
-                if old_tags != row[2]:
-                    needs_update = True
-                    updated_cells.append(2)
+                updated_cells = [
+                    idx for idx in DIFF_COLUMNS
+                    if row[idx] != old_row[idx] and (row[idx] or idx == TAGS_COL)
+                ]
                 
-                if needs_update:
+                if updated_cells:
                     updates_to_apply.append({
-                        'row_index': row_index,
+                        'nickname': nickname,
                         'data': row,
                         'updated_cells': updated_cells
                     })
-                    stats.updated_profiles += 1
+                    stats.incr('updated_profiles')
             else:
-                new_profiles.append(row)
-                stats.new_profiles += 1
+                new_profiles.append((scraped_at, row))
+                stats.incr('new_profiles')
         
-        # Sort new profiles (newest first)
+        # New profiles go on top (newest first), pushing existing rows down
         if new_profiles:
-            try:
-                new_profiles.sort(key=lambda x: datetime.strptime(x[0], "%d-%b-%y %I:%M %p"), reverse=True)
-            except:
-                pass
-            
-            log_msg(f"Inserting {len(new_profiles)} new profiles...", "INFO")
-            safe_api_call(worksheet.insert_rows, new_profiles, row=2)
+            new_profiles.sort(key=itemgetter(0), reverse=True)
+            new_profiles = [row for _, row in new_profiles]
+            sheet_requests.append({"insertDimension": {
+                "range": {"sheetId": worksheet.id, "dimension": "ROWS", "startIndex": 1, "endIndex": 1 + len(new_profiles)},
+                "inheritFromBefore": False
+            }})
+            sheet_requests.append(update_cells_request(worksheet.id, 2, 0, new_profiles))
         
-        # Apply updates with yellow highlighting
-        if updates_to_apply:
-            log_msg(f"Applying {len(updates_to_apply)} updates...", "INFO")
+        # Updates with yellow highlighting, addressed after the insert above
+        highlighted_rows = defaultdict(list)
+        for update_info in updates_to_apply:
+            row_idx = existing_rows[update_info['nickname']]['row_index'] + len(new_profiles)
+            sheet_requests.append(update_cells_request(worksheet.id, row_idx, 0, [update_info['data']]))
+            for cell_idx in update_info['updated_cells']:
+                highlighted_rows[cell_idx].append(row_idx)
+        sheet_requests.extend(highlight_requests(worksheet.id, highlighted_rows))
+        
+        if sheet_requests:
+            safe_api_call(worksheet.spreadsheet.batch_update, {"requests": sheet_requests})
             
+            # The batchUpdate is atomic, so the index only moves once it has landed
+            for info in existing_rows.values():
+                info['row_index'] += len(new_profiles)
+            for row_idx, row in enumerate(new_profiles, 2):
+                existing_rows[row[1]] = {'row_index': row_idx, 'hash': row[HASH_COL], 'data': row}
             for update_info in updates_to_apply:
-                row_idx = update_info['row_index']
-                data = update_info['data']
-                updated_cells = update_info['updated_cells']
-                
-                safe_api_call(worksheet.update, f'A{row_idx}:O{row_idx}', [data])
-                
-                if updated_cells:
-                    for cell_idx in updated_cells:
-                        cell_letter = column_letter(cell_idx)
-                        cell_range = f'{cell_letter}{row_idx}'
-                        
-                        safe_api_call(worksheet.format, cell_range, {
-                            "backgroundColor": {"red": 1.0, "green": 1.0, "blue": 0.0},
-                            "textFormat": {"bold": True}
-                        })
-        
-        log_msg(f"Batch complete: {len(new_profiles)} new, {len(updates_to_apply)} updated", "SUCCESS")
-        return True
+                info = existing_rows[update_info['nickname']]
+                info['data'] = update_info['data']
+                info['hash'] = update_info['data'][HASH_COL]
+            
+            log_msg("Batch complete: %d new, %d updated", len(new_profiles), len(updates_to_apply), level="SUCCESS")
         
     except Exception as e:
-        log_msg(f"Export failed: {e}", "ERROR")
+        log_msg(f"Export failed: {e}", level="ERROR")
         return False
+    
+    # Target statuses go in their own request; a failure here only costs the status, not the batch
+    if target_updates and target_sheet_id is None:
+        log_msg("Target sheet not found, skipping status updates", level="WARNING")
+    elif target_updates:
+        try:
+            completed_at = get_pkt_time().strftime("%Y-%m-%d %H:%M")
+            target_requests = []
+            for update in target_updates:
+                status = update['status']
+                timestamp = completed_at if status.upper() == 'COMPLETED' else ''
+                target_requests.append(update_cells_request(target_sheet_id, update['row_index'], 1,
+                                                            [[status, timestamp, update.get('notes', '')]]))
+            safe_api_call(worksheet.spreadsheet.batch_update, {"requests": target_requests})
+            log_msg("Updated %d target statuses", len(target_updates), level="SUCCESS")
+        except Exception as e:
+            log_msg(f"Target update failed: {e}", level="WARNING")
+    
+    return True
+
+# === BACKGROUND EXPORT ===
+class BatchExporter:
+    """Export batches on a worker thread so scraping overlaps Sheets I/O"""
+    def __init__(self, tags_str_mapping, worksheet, target_sheet_id, existing_rows):
+        self.tags_str_mapping = tags_str_mapping
+        self.worksheet = worksheet
+        self.target_sheet_id = target_sheet_id
+        self.existing_rows = existing_rows  # Only this thread touches it after start
+        self.queue = queue.Queue(maxsize=1)  # At most one batch waiting behind the one in flight
+        self.pending_profiles = []
+        self.pending_updates = []
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def submit(self, profiles_batch, target_updates):
+        """Queue a batch; blocks only while the worker is still behind"""
+        self.queue.put((profiles_batch, target_updates))
+    
+    def _export_pending(self):
+        if export_batch_safe(self.pending_profiles, self.tags_str_mapping, self.pending_updates,
+                             self.worksheet, self.target_sheet_id, self.existing_rows):
+            self.pending_profiles = []
+            self.pending_updates = []
+            return True
+        log_msg("Export failed, keeping data for retry", level="WARNING")
+        return False
+    
+    def _run(self):
+        last_export = None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            profiles_batch, target_updates = item
+            self.pending_profiles.extend(profiles_batch)
+            self.pending_updates.extend(target_updates)
+            
+            # Keep batch_delay between exports without stalling the scraper
+            if last_export is not None:
+                wait = GOOGLE_API_SAFE_LIMITS['batch_delay'] - (time.monotonic() - last_export)
+                if wait > 0:
+                    time.sleep(wait)
+            self._export_pending()
+            last_export = time.monotonic()
+    
+    def close(self):
+        """Wait for queued batches, retry anything left over once; returns unsaved profiles"""
+        self.queue.put(None)
+        self.thread.join()
+        if self.pending_profiles or self.pending_updates:
+            log_msg("Exporting final batch...", level="INFO")
+            self._export_pending()
+        return self.pending_profiles
+
+# === CHECKPOINT ===
+def checkpoint_line(profile):
+    """One JSONL line for a scraped profile"""
+    return json.dumps({**profile, 'SCRAPED_AT': profile['SCRAPED_AT'].isoformat()}) + "\n"
+
+def load_checkpoint():
+    """Profiles scraped by a previous run that never reached the sheet"""
+    profiles = {}
+    if not os.path.exists(CHECKPOINT_PATH):
+        return profiles
+    
+    try:
+        cutoff = get_pkt_time() - CHECKPOINT_MAX_AGE
+        expired = 0
+        with open(CHECKPOINT_PATH, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    profile = json.loads(line)
+                    profile['SCRAPED_AT'] = datetime.fromisoformat(profile['SCRAPED_AT'])
+                    nickname = profile['NICKNAME']
+                except (ValueError, KeyError, TypeError):
+                    continue  # Torn last line from a crash
+                if profile['SCRAPED_AT'] < cutoff:
+                    expired += 1
+                    continue
+                profiles[nickname] = profile
+        if expired:
+            log_msg(f"Ignoring {expired} checkpointed profiles older than {CHECKPOINT_MAX_AGE}", level="INFO")
+        if profiles:
+            log_msg(f"Resuming {len(profiles)} profiles from checkpoint", level="SUCCESS")
+    except Exception as e:
+        log_msg(f"Could not read checkpoint: {e}", level="WARNING")
+    return profiles
+
+def finalize_checkpoint(unsaved_profiles):
+    """Drop the checkpoint once everything is exported, else keep only what is unsaved"""
+    try:
+        if not unsaved_profiles:
+            if os.path.exists(CHECKPOINT_PATH):
+                os.remove(CHECKPOINT_PATH)
+            return
+        
+        tmp_path = CHECKPOINT_PATH + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(checkpoint_line(profile) for profile in unsaved_profiles)
+        os.replace(tmp_path, CHECKPOINT_PATH)
+        log_msg(f"{len(unsaved_profiles)} unsaved profiles kept in checkpoint", level="WARNING")
+    except Exception as e:
+        log_msg(f"Could not update checkpoint: {e}", level="WARNING")
+
+# === WORKER POOL ===
+worker_state = threading.local()
+
+def start_worker_driver(cookies):
+    """Start one extra browser logged in with the main session's cookies"""
+    driver = setup_github_browser()
+    if not driver:
+        return None
+    # Cookies come from a session verified moments ago, so skip the login-page check
+    try:
+        inject_cookies(driver, cookies)
+        return driver
+    except Exception as e:
+        log_msg(f"Worker session setup failed: {e}", level="WARNING")
+        driver.quit()
+        return None
+
+def start_worker_drivers(count, cookies):
+    """Start extra browsers in parallel; Chrome startup dominates, so overlap it"""
+    if count <= 0:
+        return []
+    with ThreadPoolExecutor(max_workers=count) as starter:
+        drivers = list(starter.map(lambda _: start_worker_driver(cookies), range(count)))
+    return [driver for driver in drivers if driver]
+
+def wait_for_request_slot():
+    """Keep MIN..MAX_DELAY between request starts on this browser; page time counts toward it"""
+    last_request = getattr(worker_state, 'last_request', None)
+    if last_request is not None:
+        wait = random.uniform(MIN_DELAY, MAX_DELAY) - (time.monotonic() - last_request)
+        if wait > 0:
+            time.sleep(wait)
+    worker_state.last_request = time.monotonic()
+
+def scrape_target(target_user):
+    """Scrape one target with this thread's own browser"""
+    error = None
+    wait_for_request_slot()
+    try:
+        profile = scrape_profile(worker_state.driver, target_user['username'])
+    except Exception as e:
+        profile, error = None, e
+    return target_user, profile, error
 
 # === MAIN ===
 def main():
     """Main execution"""
-    log_msg("Starting SAFE OPTIMIZED Scraper", "INFO")
-    log_msg(f"Pakistan Time: {get_pkt_time().strftime('%d-%b-%y %I:%M %p')}", "INFO")
+    log_msg("Starting SAFE OPTIMIZED Scraper", level="INFO")
+    log_msg(f"Pakistan Time: {get_pkt_time().strftime('%d-%b-%y %I:%M %p')}", level="INFO")
     
     driver = setup_github_browser()
     if not driver:
         return
     
+    drivers = [driver]
+    exporter = None
     try:
-        if not login_to_damadam(driver):
+        if not restore_session(driver) and not login_to_damadam(driver):
             return
         
         client = get_google_sheets_client()
         if not client:
             return
         
-        tags_mapping = get_tags_mapping(client, SHEET_URL)
-        target_users = get_target_users(client, SHEET_URL)
+        try:
+            workbook = client.open_by_url(SHEET_URL)
+            # One metadata fetch gives the main sheet and the Target sheetId for batchUpdate
+            worksheets = workbook.worksheets()
+            worksheet = worksheets[0]
+            target_sheet_id = next((ws.id for ws in worksheets if ws.title == "Target"), None)
+        except Exception as e:
+            log_msg(f"Failed to open sheet: {e}", level="ERROR")
+            return
+        
+        target_data, tags_data, profile_rows = load_sheet_data(workbook, worksheet)
+        tags_str_mapping = get_tags_mapping(tags_data)
+        target_users = get_target_users(target_data)
         
         if not target_users:
-            log_msg("No target users found", "ERROR")
+            log_msg("No target users found", level="ERROR")
             return
         
         stats.total = len(target_users)
         
-        batch_profiles = []
-        batch_target_updates = []
+        if not ensure_headers(worksheet, profile_rows):
+            return
+        existing_rows = build_row_index(profile_rows)
+        
+        # Profiles checkpointed by a crashed run are exported without re-scraping
+        checkpointed = load_checkpoint()
+        resumed = [t for t in target_users if t['username'] in checkpointed]
+        to_scrape = [t for t in target_users if t['username'] not in checkpointed]
+        stats.success += len(resumed)
+        
+        batch_profiles = [checkpointed[t['username']] for t in resumed]
+        batch_target_updates = [{'row_index': t['row_index'], 'status': 'Completed', 'notes': 'Successfully scraped'} for t in resumed]
         batch_size = GOOGLE_API_SAFE_LIMITS['batch_size']
         
-        log_msg(f"Processing {stats.total} users (batches of {batch_size})...", "INFO")
+        drivers = [driver] + start_worker_drivers(min(SCRAPE_WORKERS, max(1, len(to_scrape))) - 1, driver.get_cookies())
+        driver_pool = queue.Queue()
+        for worker_driver in drivers:
+            driver_pool.put(worker_driver)
         
-        for i, target_user in enumerate(target_users, 1):
-            stats.current = i
-            nickname = target_user['username']
-            row_index = target_user['row_index']
-            
-            if i % 10 == 0:
-                elapsed = (get_pkt_time() - stats.start_time).total_seconds()
-                avg_speed = elapsed / i
-                remaining = (stats.total - i) * avg_speed
-                eta = str(timedelta(seconds=int(remaining)))
-                log_msg(f"Progress: {i}/{stats.total} | Speed: {avg_speed:.1f}s/profile | ETA: {eta}", "INFO")
-            
-            log_msg(f"[{i}/{stats.total}] Scraping: {nickname}", "INFO")
-            
-            try:
-                profile = scrape_profile(driver, nickname)
+        def init_worker():
+            worker_state.driver = driver_pool.get()
+        
+        log_msg(f"Processing {stats.total} users with {len(drivers)} browsers (batches of {batch_size})...", level="INFO")
+        exporter = BatchExporter(tags_str_mapping, worksheet, target_sheet_id, existing_rows)
+        if batch_profiles:
+            exporter.submit(batch_profiles, batch_target_updates)
+            batch_profiles = []
+            batch_target_updates = []
+        
+        # Cancel queued scrapes if the consumer loop dies
+        pool = ThreadPoolExecutor(max_workers=len(drivers), initializer=init_worker)
+        checkpoint_file = open(CHECKPOINT_PATH, 'a', encoding='utf-8')
+        try:
+            for i, (target_user, profile, error) in enumerate(pool.map(scrape_target, to_scrape), len(resumed) + 1):
+                stats.current = i
+                nickname = target_user['username']
+                row_index = target_user['row_index']
+                
+                if i % 10 == 0:
+                    elapsed = time.monotonic() - stats.start_time
+                    avg_speed = elapsed / max(1, i - len(resumed))
+                    remaining = (stats.total - i) * avg_speed
+                    eta = str(timedelta(seconds=int(remaining)))
+                    log_msg("Progress: %d/%d | Speed: %.1fs/profile | ETA: %s", i, stats.total, avg_speed, eta, level="INFO")
+                
+                log_msg("[%d/%d] Scraped: %s", i, stats.total, nickname, level="INFO")
                 
                 if profile:
+                    checkpoint_file.write(checkpoint_line(profile))
+                    checkpoint_file.flush()
                     batch_profiles.append(profile)
                     stats.success += 1
                     batch_target_updates.append({
@@ -721,6 +1162,14 @@ def main():
                         'status': 'Completed',
                         'notes': 'Successfully scraped'
                     })
+                elif error:
+                    stats.errors += 1
+                    log_msg("Error: %s", error, level="ERROR")
+                    batch_target_updates.append({
+                        'row_index': row_index,
+                        'status': 'Pending',
+                        'notes': f'Error: {str(error)[:100]}'
+                    })
                 else:
                     stats.errors += 1
                     batch_target_updates.append({
@@ -728,46 +1177,35 @@ def main():
                         'status': 'Pending',
                         'notes': 'Failed - will retry'
                     })
-            except Exception as e:
-                stats.errors += 1
-                log_msg(f"Error: {e}", "ERROR")
-                batch_target_updates.append({
-                    'row_index': row_index,
-                    'status': 'Pending',
-                    'notes': f'Error: {str(e)[:100]}'
-                })
-            
-            # Export batch when ready
-            if len(batch_profiles) >= batch_size or i == stats.total:
-                log_msg(f"Exporting batch ({len(batch_profiles)} profiles)...", "INFO")
-                if export_batch_safe(batch_profiles, tags_mapping, batch_target_updates, client):
+                
+                # Hand the batch to the exporter and keep scraping
+                if len(batch_profiles) >= batch_size or (i == stats.total and batch_target_updates):
+                    log_msg("Exporting batch (%d profiles)...", len(batch_profiles), level="INFO")
+                    exporter.submit(batch_profiles, batch_target_updates)
                     batch_profiles = []
                     batch_target_updates = []
-                    if i < stats.total:
-                        log_msg(f"Batch delay {GOOGLE_API_SAFE_LIMITS['batch_delay']}s...", "INFO")
-                        time.sleep(GOOGLE_API_SAFE_LIMITS['batch_delay'])
-                else:
-                    log_msg("Export failed, keeping data for retry", "WARNING")
-            
-            time.sleep(random.uniform(MIN_DELAY, MAX_DELAY))
+        finally:
+            pool.shutdown(cancel_futures=True)
+            checkpoint_file.close()
         
-        # Export any remaining profiles
-        if batch_profiles or batch_target_updates:
-            log_msg("Exporting final batch...", "INFO")
-            export_batch_safe(batch_profiles, tags_mapping, batch_target_updates, client)
+        finalize_checkpoint(exporter.close())
+        exporter = None
         
         stats.show_summary()
-        log_msg(f"Completed: {stats.success}/{stats.total}", "INFO")
-        log_msg(f"Posts Scraped: {stats.posts_scraped}", "INFO")
-        log_msg(f"Total API Calls: {stats.api_calls}", "INFO")
+        log_msg(f"Completed: {stats.success}/{stats.total}", level="INFO")
+        log_msg(f"Posts Scraped: {stats.posts_scraped}", level="INFO")
+        log_msg(f"Total API Calls: {stats.api_calls}", level="INFO")
     except Exception as e:
-        log_msg(f"Fatal Error: {e}", "ERROR")
+        log_msg(f"Fatal Error: {e}", level="ERROR")
     finally:
-        try:
-            driver.quit()
-        except:
-            pass
-        log_msg("Scraper finished!", "INFO")
+        if exporter:
+            exporter.close()
+        for worker_driver in drivers:
+            try:
+                worker_driver.quit()
+            except:
+                pass
+        log_msg("Scraper finished!", level="INFO")
 
 if __name__ == "__main__":
     main()